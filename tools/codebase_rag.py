@@ -8,19 +8,48 @@ import os
 import sqlite3
 import json
 import hashlib
+import heapq
+import importlib.util
+import itertools
 import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+from array import array
 from pathlib import Path
 from typing import List, Dict, Optional, Tuple
 from dataclasses import dataclass, asdict
 from collections import defaultdict
 
 try:
-    from sentence_transformers import SentenceTransformer
-    HAS_EMBEDDINGS = True
+    import numpy as np
 except ImportError:
-    HAS_EMBEDDINGS = False
-    print("⚠️  sentence-transformers not installed. Using text-based search only.")
-    print("   Install with: pip install sentence-transformers")
+    np = None
+
+# Detected without importing: sentence-transformers loads torch, and spawned parser
+# workers re-run this module's top level, so the heavy imports happen on first use
+HAS_EMBEDDINGS = np is not None and importlib.util.find_spec("sentence_transformers") is not None
+HAS_FAISS = importlib.util.find_spec("faiss") is not None
+
+
+# Go declaration patterns, compiled once for all files
+_PACKAGE_RE = re.compile(r'package\s+(\w+)')
+_FUNC_RE = re.compile(r'func\s*(?:\([^)]*\)\s*)?(\w+)\s*\([^)]*\)\s*(?:\([^)]*\))?\s*\{')
+_STRUCT_RE = re.compile(r'type\s+(\w+)\s+struct\s*\{')
+_INTERFACE_RE = re.compile(r'type\s+(\w+)\s+interface\s*\{')
+_WORD_RE = re.compile(r'\w+')
+# Kept as separate patterns: each starts with a literal that re can scan for quickly,
+# which makes three scans cheaper than one alternation
+_DECL_PATTERNS = [("function", _FUNC_RE), ("struct", _STRUCT_RE), ("interface", _INTERFACE_RE)]
+
+# Directories never descended into when looking for Go files
+_SKIP_DIRS = {'vendor', 'node_modules', '.git', 'dist', 'build', 'testdata'}
+
+# Parse files across processes only for trees at least this large. Parsing costs
+# ~0.25ms per file, while starting spawn-mode workers (macOS default) costs ~0.5s
+_PARALLEL_MIN_FILES = 2000
+
+# Below this many embeddings a brute-force matmul beats an HNSW index
+_ANN_MIN_ENTITIES = 20000
 
 
 @dataclass
@@ -47,17 +76,44 @@ class GoCodeParser:
 
     def parse_all(self) -> List[CodeEntity]:
         """Parse all Go files in the repository"""
-        go_files = list(self.root_dir.rglob("*.go"))
+        go_files = self._find_go_files()
         print(f"📁 Found {len(go_files)} Go files")
 
-        for go_file in go_files:
-            # Skip test files for now (optional)
-            if "_test.go" in str(go_file):
-                continue
-            self._parse_file(go_file)
+        # Worker start-up outweighs the regex work on small trees
+        if len(go_files) < _PARALLEL_MIN_FILES or (os.cpu_count() or 1) < 2:
+            for go_file in go_files:
+                self._parse_file(go_file)
+            return self.entities
+
+        with ProcessPoolExecutor() as executor:
+            results = executor.map(
+                partial(_parse_go_file, str(self.root_dir)), go_files, chunksize=16
+            )
+            self.entities.extend(itertools.chain.from_iterable(results))
 
         return self.entities
 
+    def _find_go_files(self) -> List[Path]:
+        """List non-test Go files, pruning vendor and build directories"""
+        go_files = []
+        pending = [self.root_dir]
+
+        while pending:
+            # Unreadable directories are skipped, as rglob did
+            try:
+                with os.scandir(pending.pop()) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name not in _SKIP_DIRS:
+                                pending.append(Path(entry.path))
+                        # Skip test files for now (optional)
+                        elif entry.name.endswith(".go") and not entry.name.endswith("_test.go"):
+                            go_files.append(Path(entry.path))
+            except OSError:
+                continue
+
+        return go_files
+
     def _parse_file(self, file_path: Path):
         """Parse a single Go file"""
         try:
@@ -79,23 +135,22 @@ class GoCodeParser:
             self.entities.append(file_entity)
 
             # Extract functions and types
-            self._extract_functions(content, relative_path, file_entity.entity_id)
-            self._extract_types(content, relative_path, file_entity.entity_id)
+            self._extract_declarations(content, relative_path, file_entity.entity_id)
 
         except Exception as e:
             print(f"⚠️  Error parsing {file_path}: {e}")
 
     def _extract_package(self, content: str) -> str:
         """Extract package name from Go file"""
-        match = re.search(r'package\s+(\w+)', content)
+        match = _PACKAGE_RE.search(content)
         return match.group(1) if match else "unknown"
 
     def _extract_file_summary(self, content: str) -> str:
         """Extract file summary from comments"""
-        lines = content.split('\n')
+        lines = content.split('\n', 20)[:20]  # Check first 20 lines
         summary_lines = []
 
-        for line in lines[:20]:  # Check first 20 lines
+        for line in lines:
             if line.strip().startswith("//"):
                 summary_lines.append(line.strip("//").strip())
             elif line.strip() and not line.strip().startswith("package"):
@@ -103,60 +158,55 @@ class GoCodeParser:
 
         return " ".join(summary_lines)[:200] if summary_lines else "Go package"
 
-    def _extract_functions(self, content: str, file_path: Path, parent_id: str):
-        """Extract function definitions from Go code"""
-        # Match function signatures
-        func_pattern = r'func\s*(?:\([^)]*\)\s*)?(\w+)\s*\([^)]*\)\s*(?:\([^)]*\))?\s*\{'
+    def _extract_declarations(self, content: str, file_path: Path, parent_id: str):
+        """Extract functions, structs and interfaces from Go code in source order"""
+        line_number = 1
+        last_pos = 0
 
-        for match in re.finditer(func_pattern, content):
-            func_name = match.group(1)
-            line_number = content[:match.start()].count('\n') + 1
+        # Merge the matches of each pattern by position so lines are counted in one pass
+        matches = heapq.merge(
+            *[self._tagged_matches(pattern, entity_type, content)
+              for entity_type, pattern in _DECL_PATTERNS]
+        )
 
-            # Extract function signature and body
-            signature, body = self._extract_code_block(content, match.start(), match.end())
+        for _, entity_type, match in matches:
+            name = match.group(1)
+
+            # Advance the line count from the previous match only
+            line_number += content.count('\n', last_pos, match.start())
+            last_pos = match.start()
 
             # Skip test functions
-            if func_name.startswith("Test"):
+            if entity_type == "function" and name.startswith("Test"):
                 continue
 
+            signature, body = self._extract_code_block(content, match.start(), match.end())
+
+            if entity_type == "function":
+                entity_id = f"func:{file_path}:{name}:{line_number}"
+                summary = f"Function {name}"
+            else:
+                entity_id = f"{entity_type}:{file_path}:{name}:{line_number}"
+                summary = f"{entity_type.capitalize()} {name}"
+
             entity = CodeEntity(
-                entity_id=f"func:{file_path}:{func_name}:{line_number}",
-                entity_type="function",
-                name=func_name,
+                entity_id=entity_id,
+                entity_type=entity_type,
+                name=name,
                 file_path=str(file_path),
                 line_number=line_number,
                 content=body[:300],
-                summary=f"Function {func_name}",
+                summary=summary,
                 signature=signature,
                 parent_entity=parent_id
             )
             self.entities.append(entity)
 
-    def _extract_types(self, content: str, file_path: Path, parent_id: str):
-        """Extract type definitions (structs, interfaces) from Go code"""
-        # Match struct definitions
-        struct_pattern = r'type\s+(\w+)\s+struct\s*\{'
-        interface_pattern = r'type\s+(\w+)\s+interface\s*\{'
-
-        for pattern, type_name in [(struct_pattern, "struct"), (interface_pattern, "interface")]:
-            for match in re.finditer(pattern, content):
-                name = match.group(1)
-                line_number = content[:match.start()].count('\n') + 1
-
-                signature, body = self._extract_code_block(content, match.start(), match.end())
-
-                entity = CodeEntity(
-                    entity_id=f"{type_name}:{file_path}:{name}:{line_number}",
-                    entity_type=type_name,
-                    name=name,
-                    file_path=str(file_path),
-                    line_number=line_number,
-                    content=body[:300],
-                    summary=f"{type_name.capitalize()} {name}",
-                    signature=signature,
-                    parent_entity=parent_id
-                )
-                self.entities.append(entity)
+    @staticmethod
+    def _tagged_matches(pattern: "re.Pattern", entity_type: str, content: str):
+        """Yield (position, entity_type, match) for each match of a declaration pattern"""
+        for match in pattern.finditer(content):
+            yield match.start(), entity_type, match
 
     def _extract_code_block(self, content: str, start: int, end: int) -> Tuple[str, str]:
         """Extract code block from content"""
@@ -182,41 +232,112 @@ class GoCodeParser:
         return signature, body
 
 
+def _parse_go_file(root_dir: str, file_path: Path) -> List[CodeEntity]:
+    """Parse a single Go file in a worker process"""
+    parser = GoCodeParser(root_dir)
+    parser._parse_file(file_path)
+    return parser.entities
+
+
 class EmbeddingGenerator:
     """Generate embeddings for code entities"""
 
-    def __init__(self):
+    DEFAULT_MODEL = 'all-MiniLM-L6-v2'  # Fast, lightweight
+
+    def __init__(self, model_name: str = DEFAULT_MODEL):
+        self.model_name = model_name
         self.model = None
         if HAS_EMBEDDINGS:
             try:
+                from sentence_transformers import SentenceTransformer
+
                 print("🔄 Loading embedding model...")
-                self.model = SentenceTransformer('all-MiniLM-L6-v2')  # Fast, lightweight
+                self.model = SentenceTransformer(model_name)
                 print("✅ Embedding model loaded")
             except Exception as e:
                 print(f"⚠️  Could not load embedding model: {e}")
 
+        # Repeated search queries skip the model
+        self._cached_query_embedding = lru_cache(maxsize=1024)(self._encode_query)
+
+    @staticmethod
+    def entity_text(entity: CodeEntity) -> str:
+        """Build the text that is embedded for a code entity"""
+        # Use entity summary and signature for embedding
+        return f"{entity.name} {entity.entity_type} {entity.summary} {entity.signature}"
+
     def generate(self, entity: CodeEntity) -> Optional[List[float]]:
         """Generate embedding for a code entity"""
         if not self.model:
             return None
 
         try:
-            # Use entity summary and signature for embedding
-            text = f"{entity.name} {entity.entity_type} {entity.summary} {entity.signature}"
-            embedding = self.model.encode(text, convert_to_tensor=False)
-            return embedding.tolist()
+            # Same path as batch indexing, so vectors are normalized identically
+            return self.encode_batch([self.entity_text(entity)])[0].tolist()
         except Exception as e:
             print(f"⚠️  Error embedding {entity.name}: {e}")
             return None
 
+    def encode_batch(self, texts: List[str]) -> "np.ndarray":
+        """Encode a list of texts in batches, returning one row per text"""
+        # Pass the full list: encode() sorts it by length into similar-sized batches
+        # and returns rows in input order
+        return self.model.encode(
+            texts,
+            batch_size=64,
+            show_progress_bar=len(texts) > 1,
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        )
+
+    def embed_all(self, entities: List[CodeEntity]) -> Dict[str, "np.ndarray"]:
+        """Generate embeddings for all entities, keyed by entity_id"""
+        if not self.model or not entities:
+            return {}
+
+        texts = [self.entity_text(entity) for entity in entities]
+        try:
+            embs = self.encode_batch(texts)
+        except Exception as e:
+            print(f"⚠️  Error embedding entities: {e}")
+            return {}
+
+        return {entity.entity_id: emb for entity, emb in zip(entities, embs)}
+
+    def encode_query(self, query: str) -> "np.ndarray":
+        """Encode a search query into a normalized float32 vector (cached, read-only)"""
+        # The MiniLM tokenizer is uncased, so case and padding do not change the embedding
+        return self._cached_query_embedding(query.strip().lower())
+
+    def _encode_query(self, query: str) -> "np.ndarray":
+        """Encode a normalized query without caching"""
+        embedding = self.model.encode(
+            query, convert_to_numpy=True, normalize_embeddings=True
+        ).astype(np.float32)
+        embedding.setflags(write=False)
+        return embedding
+
 
 class CodebaseRAG:
     """Main RAG system for codebase"""
 
-    def __init__(self, db_path: str = "codebase.db"):
+    # Bumped whenever stored data needs migrating (tracked in PRAGMA user_version)
+    SCHEMA_VERSION = 1
+
+    def __init__(self, db_path: str = "codebase.db", embedding_gen: Optional[EmbeddingGenerator] = None):
         self.db_path = db_path
         self.conn = None
         self.cursor = None
+        # Shared by indexing and search; created on first use when not supplied
+        self.embedding_gen = embedding_gen
+        if not HAS_EMBEDDINGS:
+            print("⚠️  sentence-transformers not installed. Using text-based search only.")
+            print("   Install with: pip install sentence-transformers")
+        # Embedding matrix for vector search, loaded lazily by _load_embedding_matrix
+        self.emb_matrix = None
+        self.emb_ids: List[str] = []
+        self.emb_types: List[str] = []
+        self.ann_index = None  # faiss HNSW index over emb_matrix, for large databases
         self._init_db()
 
     def _init_db(self):
@@ -224,6 +345,12 @@ class CodebaseRAG:
         self.conn = sqlite3.connect(self.db_path)
         self.cursor = self.conn.cursor()
 
+        # Favor bulk write and read throughput; the index can always be rebuilt
+        self.cursor.execute("PRAGMA journal_mode=WAL")
+        self.cursor.execute("PRAGMA synchronous=NORMAL")
+        self.cursor.execute("PRAGMA temp_store=MEMORY")
+        self.cursor.execute("PRAGMA mmap_size=268435456")
+
         # Create tables
         self.cursor.execute("""
             CREATE TABLE IF NOT EXISTS entities (
@@ -236,45 +363,94 @@ class CodebaseRAG:
                 summary TEXT,
                 signature TEXT,
                 parent_entity TEXT,
-                embedding BLOB
+                embedding BLOB,
+                content_hash TEXT
             )
         """)
 
+        # Databases built before content hashing lack the column
+        columns = {row[1] for row in self.cursor.execute("PRAGMA table_info(entities)")}
+        if 'content_hash' not in columns:
+            self.cursor.execute("ALTER TABLE entities ADD COLUMN content_hash TEXT")
+
+        self.cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_entities_content_hash ON entities (content_hash)"
+        )
+
+        # Full-text keyword index; rowid mirrors the rowid of the entity row
+        has_fts = self.cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'search_fts'"
+        ).fetchone()
         self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS search_index (
-                entity_id TEXT PRIMARY KEY,
-                keywords TEXT,
-                FOREIGN KEY (entity_id) REFERENCES entities (entity_id)
+            CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5(
+                entity_id UNINDEXED,
+                keywords,
+                tokenize='porter unicode61'
             )
         """)
 
+        # Carry keywords over from the former search_index table
+        has_legacy_index = self.cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'search_index'"
+        ).fetchone()
+        if has_legacy_index:
+            if not has_fts:
+                self.cursor.execute("""
+                    INSERT INTO search_fts (rowid, entity_id, keywords)
+                    SELECT e.rowid, s.entity_id, s.keywords
+                    FROM search_index s JOIN entities e ON e.entity_id = s.entity_id
+                """)
+            self.cursor.execute("DROP TABLE search_index")
+
+        (version,) = self.cursor.execute("PRAGMA user_version").fetchone()
+        if version < 1:
+            self._convert_embeddings_to_float32()
+        self.cursor.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+
         self.conn.commit()
 
+    def _convert_embeddings_to_float32(self):
+        """Rewrite embeddings stored by older versions as float64 into float32"""
+        rows = self.cursor.execute(
+            "SELECT entity_id, embedding FROM entities WHERE embedding IS NOT NULL"
+        ).fetchall()
+        self.cursor.executemany(
+            "UPDATE entities SET embedding = ? WHERE entity_id = ?",
+            [(array('f', array('d', blob)).tobytes(), entity_id) for entity_id, blob in rows]
+        )
+
     def index_entities(self, entities: List[CodeEntity]):
         """Index code entities into the database"""
         print(f"\n📝 Indexing {len(entities)} code entities...")
 
-        embedding_gen = EmbeddingGenerator()
-
-        for i, entity in enumerate(entities):
-            if i % 50 == 0:
-                print(f"  Progress: {i}/{len(entities)}")
-
-            # Generate embedding
-            embedding = embedding_gen.generate(entity)
-
-            # Convert embedding to bytes
-            embedding_bytes = None
-            if embedding:
-                import struct
-                embedding_bytes = struct.pack(f'{len(embedding)}d', *embedding)
+        # Reuse stored embeddings for entities whose embedded text and model are unchanged
+        model_name = self.embedding_gen.model_name if self.embedding_gen else EmbeddingGenerator.DEFAULT_MODEL
+        content_hashes = {
+            entity.entity_id: self._content_hash(EmbeddingGenerator.entity_text(entity), model_name)
+            for entity in entities
+        }
+        cached = self._cached_embeddings(set(content_hashes.values()))
+        to_embed = [e for e in entities if content_hashes[e.entity_id] not in cached]
 
-            # Insert entity
-            self.cursor.execute("""
-                INSERT OR REPLACE INTO entities
-                (entity_id, entity_type, name, file_path, line_number, content, summary, signature, parent_entity, embedding)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
+        # Generate remaining embeddings before touching the database
+        embeddings = {}
+        if HAS_EMBEDDINGS:
+            print(f"  Embedding cache: {len(entities) - len(to_embed)} hits, {len(to_embed)} to embed")
+            if to_embed:
+                embeddings = self._get_embedding_gen().embed_all(to_embed)
+
+        entity_rows = []
+        keyword_rows = []
+        for entity in entities:
+            content_hash = content_hashes[entity.entity_id]
+            embedding = embeddings.get(entity.entity_id)
+
+            # Convert embedding to float32 bytes
+            embedding_bytes = cached.get(content_hash)
+            if embedding is not None:
+                embedding_bytes = np.asarray(embedding, dtype=np.float32).tobytes()
+
+            entity_rows.append((
                 entity.entity_id,
                 entity.entity_type,
                 entity.name,
@@ -284,76 +460,105 @@ class CodebaseRAG:
                 entity.summary,
                 entity.signature,
                 entity.parent_entity,
-                embedding_bytes
+                embedding_bytes,
+                content_hash
             ))
 
             # Create search keywords
-            keywords = self._create_keywords(entity)
-            self.cursor.execute("""
-                INSERT OR REPLACE INTO search_index (entity_id, keywords)
-                VALUES (?, ?)
-            """, (entity.entity_id, keywords))
+            keyword_rows.append((self._create_keywords(entity), entity.entity_id))
 
-        self.conn.commit()
+        entity_ids = [(entity.entity_id,) for entity in entities]
+
+        # Write everything in one transaction
+        with self.conn:
+            # Drop the keyword rows of entities being replaced
+            self.cursor.executemany("""
+                DELETE FROM search_fts
+                WHERE rowid IN (SELECT rowid FROM entities WHERE entity_id = ?)
+            """, entity_ids)
+
+            self.cursor.executemany("""
+                INSERT OR REPLACE INTO entities
+                (entity_id, entity_type, name, file_path, line_number, content, summary, signature, parent_entity, embedding, content_hash)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, entity_rows)
+
+            self.cursor.executemany("""
+                INSERT OR REPLACE INTO search_fts (rowid, entity_id, keywords)
+                SELECT rowid, entity_id, ? FROM entities WHERE entity_id = ?
+            """, keyword_rows)
+
+        self.emb_matrix = None  # Reload embeddings on next search
+        self.ann_index = None
+        ann_path = self._ann_index_path()
+        if ann_path and os.path.exists(ann_path):
+            os.remove(ann_path)
         print(f"✅ Indexed {len(entities)} entities successfully\n")
 
+    def _cached_embeddings(self, content_hashes: set) -> Dict[str, bytes]:
+        """Return stored embeddings for the given content hashes, keyed by hash"""
+        cached = {}
+        hashes = list(content_hashes)
+
+        # Chunked to stay under SQLite's bound-parameter limit; served by idx_entities_content_hash
+        for start in range(0, len(hashes), 500):
+            chunk = hashes[start:start + 500]
+            placeholders = ",".join(["?" for _ in chunk])
+            cached.update(self.cursor.execute(f"""
+                SELECT content_hash, embedding FROM entities
+                WHERE content_hash IN ({placeholders}) AND embedding IS NOT NULL
+            """, chunk).fetchall())
+
+        return cached
+
+    def _get_embedding_gen(self) -> EmbeddingGenerator:
+        """Return the embedding generator, loading the model only once"""
+        if self.embedding_gen is None:
+            self.embedding_gen = EmbeddingGenerator()
+        return self.embedding_gen
+
+    @staticmethod
+    def _content_hash(text: str, model_name: str) -> str:
+        """Hash the embedded text and model of an entity for embedding cache lookups"""
+        key = f"{model_name}\0{text}"
+        return hashlib.blake2b(key.encode('utf-8'), digest_size=16).hexdigest()
+
     def _create_keywords(self, entity: CodeEntity) -> str:
         """Create searchable keywords for an entity"""
-        words = []
-
-        # Add name parts
-        words.extend(re.findall(r'\b\w+\b', entity.name))
-
-        # Add type
+        # Name parts, type, first summary words, then file path components
+        words = _WORD_RE.findall(entity.name.lower())
         words.append(entity.entity_type)
+        words.extend(_WORD_RE.findall(entity.summary.lower())[:5])
+        words.extend(entity.file_path.lower().split('/'))
 
-        # Add summary words
-        words.extend(re.findall(r'\b\w+\b', entity.summary)[:5])
-
-        # Add file path components
-        words.extend(entity.file_path.split('/'))
-
-        return " ".join(words).lower()
+        return " ".join(words)
 
     def search(self, query: str, limit: int = 10, entity_types: Optional[List[str]] = None) -> List[Dict]:
-        """Search for code entities"""
-        results = []
-
-        # Text-based search
-        sql = "SELECT * FROM entities WHERE 1=1"
-        params = []
+        """Search for code entities, fusing keyword and vector similarity rankings"""
+        match_query = self._fts_query(query)
+        if not match_query:
+            return []
 
-        # Add entity type filter
-        if entity_types:
-            placeholders = ",".join(["?" for _ in entity_types])
-            sql += f" AND entity_type IN ({placeholders})"
-            params.extend(entity_types)
-
-        # Add keyword search
-        keywords = query.lower().split()
-        search_index = self.cursor.execute("SELECT entity_id FROM search_index").fetchall()
-
-        matching_ids = []
-        for (entity_id,) in search_index:
-            keywords_str = self.cursor.execute(
-                "SELECT keywords FROM search_index WHERE entity_id = ?", (entity_id,)
-            ).fetchone()
-
-            if keywords_str:
-                keywords_text = keywords_str[0].lower()
-                match_count = sum(1 for kw in keywords if kw in keywords_text)
-                if match_count > 0:
-                    matching_ids.append((entity_id, match_count))
+        rankings = [self._keyword_search(match_query, limit, entity_types)]
+        if HAS_EMBEDDINGS:
+            rankings.append(self._vector_search(query, limit, entity_types))
 
-        # Sort by relevance
-        matching_ids.sort(key=lambda x: x[1], reverse=True)
+        top_ids = self._fuse_rankings(rankings)[:limit]
+        if not top_ids:
+            return []
 
         # Fetch full entities
-        for entity_id, _ in matching_ids[:limit]:
-            entity_data = self.cursor.execute(
-                "SELECT * FROM entities WHERE entity_id = ?", (entity_id,)
-            ).fetchone()
+        placeholders = ",".join(["?" for _ in top_ids])
+        # Only the columns returned to callers; skips reading the embedding BLOB
+        rows = self.cursor.execute(f"""
+            SELECT entity_id, entity_type, name, file_path, line_number, content, summary, signature
+            FROM entities WHERE entity_id IN ({placeholders})
+        """, top_ids).fetchall()
+        entities_by_id = {row[0]: row for row in rows}
 
+        results = []
+        for entity_id in top_ids:
+            entity_data = entities_by_id.get(entity_id)
             if entity_data:
                 results.append({
                     'entity_id': entity_data[0],
@@ -368,6 +573,133 @@ class CodebaseRAG:
 
         return results
 
+    def _keyword_search(self, match_query: str, limit: int,
+                        entity_types: Optional[List[str]] = None) -> List[str]:
+        """Return entity ids matching an FTS5 query, best first"""
+        # Rank keyword matches with BM25 inside SQLite
+        sql = """
+            SELECT e.entity_id FROM search_fts
+            JOIN entities e ON e.rowid = search_fts.rowid
+            WHERE search_fts MATCH ?
+        """
+        params = [match_query]
+
+        # Add entity type filter
+        if entity_types:
+            placeholders = ",".join(["?" for _ in entity_types])
+            sql += f" AND e.entity_type IN ({placeholders})"
+            params.extend(entity_types)
+
+        sql += " ORDER BY bm25(search_fts) LIMIT ?"
+        params.append(limit)
+
+        return [entity_id for (entity_id,) in self.cursor.execute(sql, params).fetchall()]
+
+    def _load_embedding_matrix(self, dim: int):
+        """Load stored embeddings of dimension dim into a row-normalized (N, dim) float32 matrix"""
+        # Vectors left by a model with another dimension cannot be compared and are skipped
+        rows = self.cursor.execute(
+            "SELECT entity_id, entity_type, embedding FROM entities "
+            "WHERE embedding IS NOT NULL AND length(embedding) = ? ORDER BY rowid",
+            (dim * np.dtype(np.float32).itemsize,)
+        ).fetchall()
+
+        self.emb_ids = [entity_id for entity_id, _, _ in rows]
+        self.emb_types = [entity_type for _, entity_type, _ in rows]
+        self.ann_index = None
+        if not rows:
+            self.emb_matrix = np.empty((0, dim), dtype=np.float32)
+            return
+
+        matrix = np.stack([np.frombuffer(blob, dtype=np.float32) for _, _, blob in rows])
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self.emb_matrix = matrix / norms
+
+        if HAS_FAISS and len(rows) >= _ANN_MIN_ENTITIES:
+            self.ann_index = self._load_ann_index()
+
+    def _ann_index_path(self) -> Optional[str]:
+        """Path of the persisted HNSW index, or None for in-memory databases"""
+        if self.db_path == ":memory:":
+            return None
+        return f"{self.db_path}.faiss"
+
+    def _load_ann_index(self):
+        """Load the persisted HNSW index, rebuilding it when missing or stale"""
+        import faiss
+
+        path = self._ann_index_path()
+        if path and os.path.exists(path):
+            index = faiss.read_index(path)
+            if index.ntotal == len(self.emb_ids) and index.d == self.emb_matrix.shape[1]:
+                return index
+
+        print(f"🔄 Building HNSW index for {len(self.emb_ids)} embeddings...")
+        index = faiss.IndexHNSWFlat(self.emb_matrix.shape[1], 32, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = 200
+        index.add(self.emb_matrix)
+        if path:
+            faiss.write_index(index, path)
+        return index
+
+    def _vector_search(self, query: str, limit: int,
+                       entity_types: Optional[List[str]] = None) -> List[str]:
+        """Return entity ids most similar to the query embedding, best first"""
+        embedding_gen = self._get_embedding_gen()
+        if not embedding_gen.model:
+            return []
+
+        query_embedding = embedding_gen.encode_query(query)
+        if self.emb_matrix is None or self.emb_matrix.shape[1] != query_embedding.shape[0]:
+            self._load_embedding_matrix(query_embedding.shape[0])
+        if not self.emb_ids:
+            return []
+
+        # HNSW cannot filter while searching; type-filtered queries use the exact scan below
+        if self.ann_index is not None and not entity_types:
+            return self._ann_search(query_embedding, limit)
+
+        scores = self.emb_matrix @ query_embedding
+
+        # Exclude rows of other entity types
+        if entity_types:
+            scores = np.where(np.isin(self.emb_types, entity_types), scores, -np.inf)
+
+        k = min(limit, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [self.emb_ids[i] for i in top if np.isfinite(scores[i])]
+
+    def _ann_search(self, query_embedding: "np.ndarray", limit: int) -> List[str]:
+        """Return approximate nearest entity ids from the HNSW index, best first"""
+        k = min(len(self.emb_ids), limit)
+        if k <= 0:
+            return []
+
+        self.ann_index.hnsw.efSearch = max(64, k)
+        _, indices = self.ann_index.search(np.array(query_embedding[None, :]), k)
+        return [self.emb_ids[i] for i in indices[0] if i >= 0]
+
+    @staticmethod
+    def _fuse_rankings(rankings: List[List[str]], k: int = 60) -> List[str]:
+        """Merge ranked id lists with Reciprocal Rank Fusion"""
+        scores = defaultdict(float)
+        for ranking in rankings:
+            for rank, entity_id in enumerate(ranking):
+                scores[entity_id] += 1.0 / (k + rank + 1)
+        return sorted(scores, key=scores.get, reverse=True)
+
+    @staticmethod
+    def _fts_query(query: str) -> str:
+        """Build an FTS5 MATCH expression that ORs each query term"""
+        terms = []
+        for word in query.lower().split():
+            quoted = '"' + word.replace('"', '""') + '"'
+            # Exact (stemmed) match or prefix match, e.g. "chain" in "chainbuilder"
+            terms.append(f"{quoted} OR {quoted}*")
+        return " OR ".join(terms)
+
     def get_architecture_overview(self) -> Dict:
         """Get architecture overview of the codebase"""
         stats = {